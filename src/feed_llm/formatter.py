@@ -4,6 +4,9 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from pathlib import Path
 
+# Characters escaped in XML output; "&" must come first.
+_XML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"))
+
 
 class FormatterStrategy(ABC):
     """Abstract base class for different formatting strategies."""
@@ -64,9 +67,11 @@ class XmlFormatter(FormatterStrategy):
         :param content: The text content of the file.
         :return: XML formatted string.
         """
-        escaped_content = (
-            content.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        )
+        escaped_content = content
+        for char, entity in _XML_ESCAPES:
+            # Skip the copy entirely when the character does not occur.
+            if char in escaped_content:
+                escaped_content = escaped_content.replace(char, entity)
         return f"<file path='{path}'>\n{escaped_content}\n</file>\n"
 
     def format_binary_file(self, path: Path) -> str:
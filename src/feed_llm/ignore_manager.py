@@ -4,6 +4,7 @@ All comments in English.
 This module handles:
 - Loading the default ignore patterns from 'default_ignores.txt'.
 - Loading additional ignore patterns from '.feed-llm-ignore' in the target directory.
+- Compiling all patterns into one matcher (a name set plus a single regular expression).
 - Providing a function to decide whether a given path should be ignored.
 
 If --no-ignore is given, these patterns are not used at all.
@@ -12,20 +13,53 @@ If --no-ignore is given, these patterns are not used at all.
 from __future__ import annotations
 
 import fnmatch
+import os
+import re
 from pathlib import Path
 
+# --- Characters that make a pattern a glob rather than a literal file name ---
+_GLOB_CHARS = frozenset("*?[")
 
-def load_ignore_patterns(root_dir: Path, no_ignore: bool) -> list[str]:
+
+class IgnoreMatcher:
+    """
+    Compiled ignore patterns.
+
+    Patterns without glob characters (like '.git' or 'node_modules') are plain
+    names and are looked up in a set. Only the real globs are combined into
+    one alternation regex, so the regex stays small.
+    """
+
+    def __init__(self, names: frozenset[str], pattern: re.Pattern[str] | None):
+        """
+        :param names: Normalized literal names to ignore.
+        :param pattern: Alternation regex of the remaining glob patterns, if any.
+        """
+        self.names = names
+        self.pattern = pattern
+
+    def matches(self, name: str) -> bool:
+        """
+        :param name: A file or directory name (not a full path).
+        :return: True if the name matches any of the patterns.
+        """
+        name = os.path.normcase(name)
+        if name in self.names:
+            return True
+        return self.pattern is not None and self.pattern.match(name) is not None
+
+
+def load_ignore_patterns(root_dir: Path, no_ignore: bool) -> IgnoreMatcher | None:
     """
     Load ignore patterns from the default_ignores.txt resource and
     from .feed-llm-ignore in the root_dir, unless --no-ignore is True.
 
     :param root_dir: Target directory where .feed-llm-ignore might exist.
     :param no_ignore: If True, do not load or apply any ignore patterns.
-    :return: A list of glob-like patterns for ignoring.
+    :return: A compiled matcher for all patterns, or None if there are none.
     """
     if no_ignore:
-        return []
+        return None
 
     patterns = []
 
@@ -53,24 +87,52 @@ def load_ignore_patterns(root_dir: Path, no_ignore: bool) -> list[str]:
         except Exception:
             pass
 
-    return patterns
+    return compile_ignore_patterns(patterns)
+
+
+def compile_ignore_patterns(patterns: list[str]) -> IgnoreMatcher | None:
+    """
+    Compile glob-like patterns into an IgnoreMatcher.
+
+    Literal patterns go into a set. Glob patterns are translated with
+    fnmatch.translate and joined into one alternation regex, so matching a
+    name is equivalent to calling fnmatch.fnmatch for every pattern, but
+    costs a set lookup and at most one regex call.
+
+    :param patterns: Glob-like patterns (like '*.pyc' or '.git').
+    :return: The compiled matcher, or None if there are no patterns.
+    """
+    if not patterns:
+        return None
+    names: set[str] = set()
+    globs: list[str] = []
+    for p in patterns:
+        p = os.path.normcase(p)
+        if _GLOB_CHARS.isdisjoint(p):
+            names.add(p)
+        else:
+            globs.append(p)
+    pattern = None
+    if globs:
+        pattern = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in globs))
+    return IgnoreMatcher(frozenset(names), pattern)
 
 
-def should_ignore(path: Path, ignore_patterns: list[str]) -> bool:
+def should_ignore(
+    path: Path | os.DirEntry[str], ignore_matcher: IgnoreMatcher | None
+) -> bool:
     """
-    Decide if 'path' should be ignored based on the given ignore patterns.
+    Decide if 'path' should be ignored based on the compiled ignore patterns.
 
-    This function does a filename-based match using fnmatch, i.e.:
+    This function does a filename-based match, i.e.:
     - If path.name matches any pattern (like '*.pyc' or '.git' etc.),
       then path is ignored (excluded).
     - For directories, a match on its name also excludes the entire subtree.
 
-    :param path: The file or directory path to test.
-    :param ignore_patterns: The patterns loaded from default_ignores.txt and/or .feed-llm-ignore.
+    :param path: The file or directory path (or os.scandir entry) to test.
+    :param ignore_matcher: The matcher returned by load_ignore_patterns (None matches nothing).
     :return: True if 'path' should be ignored, False otherwise.
     """
-    name = path.name
-    for pattern in ignore_patterns:
-        if fnmatch.fnmatch(name, pattern):
-            return True
-    return False
+    if ignore_matcher is None:
+        return False
+    return ignore_matcher.matches(path.name)
@@ -1,6 +1,8 @@
 """CLI entry point using cyclopts. All comments in English."""
 
 from __future__ import annotations
+import codecs
+import functools
 import logging
 import mimetypes
 from pathlib import Path
@@ -18,6 +20,30 @@ from feed_llm.ignore_manager import load_ignore_patterns
 # --- Module-level cache for the save directory ---
 _STATE_DIR: Path | None = None
 
+# --- Module-level cache for suffixes that mimetypes considers text ---
+_MIME_TEXT_EXTS: frozenset[str] | None = None
+
+# --- Deletion table of bytes that look like text (printable ASCII and common controls) ---
+_TEXT_BYTES = bytes(range(32, 127)) + b"\t\n\v\f\r\x1b"
+
+# --- Size of the header probed for NUL bytes before reading the rest of the sample ---
+_PROBE_BYTES = 32
+
+# --- Suffixes classified without reading the file ---
+_TEXT_EXTS = frozenset(
+    (
+        ".py .pyi .md .txt .rst .json .toml .yaml .yml .cfg .ini .js .mjs .ts .tsx"
+        " .jsx .html .css .scss .xml .svg .c .h .cpp .hpp .cc .rs .go .java .kt .rb"
+        " .php .lua .sh .bash .zsh .sql .csv .lock"
+    ).split()
+)
+_BIN_EXTS = frozenset(
+    (
+        ".png .jpg .jpeg .gif .webp .ico .pdf .zip .tar .gz .bz2 .xz .7z .exe .dll"
+        " .so .dylib .o .a .class .jar .whl .pyc .woff .woff2 .ttf"
+    ).split()
+)
+
 
 app = cyclopts.App(name="feed-llm")
 
@@ -48,23 +74,50 @@ def _get_save_dir() -> Path:
     return save_dir
 
 
+@functools.lru_cache(maxsize=None)
 def _get_state_file(directory: Path) -> Path:
     """
     For a given target directory, compute a state file path inside the save directory.
-    The file name is based on the MD5 hash of the directory's absolute path.
+    The file name is based on the BLAKE2b hash of the directory's absolute path
+    (a non-cryptographic use, so it also works on FIPS-restricted builds).
+    Cached, so resolve() and hashing run only once per directory per process.
     """
     resolved = directory.resolve()
-    hash_digest = hashlib.md5(str(resolved).encode("utf-8")).hexdigest()
+    hash_digest = hashlib.blake2b(
+        str(resolved).encode("utf-8"), digest_size=16, usedforsecurity=False
+    ).hexdigest()
     state_file = _get_save_dir() / f"{hash_digest}.json"
     return state_file
 
 
+def _get_legacy_state_file(directory: Path) -> Path:
+    """
+    Compute the state file path used by older versions (MD5 of the absolute path).
+    Only consulted when no state file exists under the current naming scheme,
+    and renamed to the current name when found.
+    """
+    resolved = directory.resolve()
+    hash_digest = hashlib.md5(
+        str(resolved).encode("utf-8"), usedforsecurity=False
+    ).hexdigest()
+    return _get_save_dir() / f"{hash_digest}.json"
+
+
 def _load_state(directory: Path) -> list[str]:
     """
     Load saved state for the given directory.
     Returns a list of relative file paths (as strings) that were selected previously.
     """
     state_file = _get_state_file(directory)
+    if not state_file.exists():
+        legacy_file = _get_legacy_state_file(directory)
+        if legacy_file.exists():
+            # Migrate it to the current name, so no stale copy is left behind.
+            try:
+                legacy_file.replace(state_file)
+            except OSError as e:
+                logging.warning(f"Failed to migrate {legacy_file}: {e}")
+                state_file = legacy_file
     if state_file.exists():
         try:
             with state_file.open("r", encoding="utf-8") as f:
@@ -120,12 +173,12 @@ def app_main(
     previous_state = _load_state(target_dir)
 
     # Load ignore patterns (unless no_ignore is True).
-    ignore_patterns = load_ignore_patterns(target_dir, no_ignore=no_ignore)
+    ignore_matcher = load_ignore_patterns(target_dir, no_ignore=no_ignore)
 
     # Run the TUI to get selected file paths, passing in the saved state & ignore patterns.
     try:
         selected_paths, save_flag = feed_llm.ui.run_file_selection_app(
-            target_dir, saved_state=previous_state, ignore_patterns=ignore_patterns
+            target_dir, saved_state=previous_state, ignore_matcher=ignore_matcher
         )
     except KeyboardInterrupt:
         return
@@ -157,55 +210,155 @@ def app_main(
     for bp in warn_binary_paths:
         logging.warning(f"Selected binary file: {bp}")
 
-    final_output = "\n".join(formatted_files)
-
     if stdout:
-        print(final_output)
+        _print_chunks(formatted_files)
     else:
         try:
             import pyperclip
 
-            pyperclip.copy(final_output)
+            pyperclip.copy("\n".join(formatted_files))
             logging.info("Output has been copied to clipboard.")
         except ImportError:
             logging.warning("pyperclip is not installed. Printing to stdout.")
-            print(final_output)
+            _print_chunks(formatted_files)
 
     # --- Save state only on normal exit (via 'q') ---
     if save_flag:
         _save_state(target_dir, selected_paths)
 
 
+def _print_chunks(chunks: list[str]) -> None:
+    """
+    Print chunks separated by newlines, like print("\n".join(chunks)),
+    but without building the joined string in memory.
+    """
+    write = sys.stdout.write
+    for i, chunk in enumerate(chunks):
+        if i:
+            write("\n")
+        write(chunk)
+    write("\n")
+
+
+def _get_mime_text_exts() -> frozenset[str]:
+    """
+    Collect the suffixes that mimetypes maps to a text type (or application/xml).
+    Built once from the mimetypes tables, so each lookup is a set membership test
+    instead of a full mimetypes.guess_type call.
+    """
+    global _MIME_TEXT_EXTS
+    if _MIME_TEXT_EXTS is not None:
+        return _MIME_TEXT_EXTS
+
+    mimetypes.init()
+    known = {**mimetypes.common_types, **mimetypes.types_map}
+    _MIME_TEXT_EXTS = frozenset(
+        ext.lower()
+        for ext, mime in known.items()
+        if mime.startswith("text/") or mime == "application/xml"
+    )
+    return _MIME_TEXT_EXTS
+
+
+@functools.lru_cache(maxsize=None)
+def _get_magic():
+    """
+    Create a libmagic encoding detector once, using the optional python-magic module.
+    Returns None if it (or the libmagic library it wraps) is not available.
+    """
+    try:
+        import magic
+    except ImportError:
+        return None
+    try:
+        return magic.Magic(mime_encoding=True)
+    except Exception as e:
+        logging.warning(f"libmagic is not usable: {e}")
+        return None
+
+
+def _is_binary_by_magic(path: Path) -> bool:
+    """
+    Ask libmagic for the file's encoding; only a definite "binary" answer counts.
+    Returns False if python-magic is not installed or detection fails.
+    """
+    detector = _get_magic()
+    if detector is None:
+        return False
+    try:
+        return detector.from_file(str(path)) == "binary"
+    except Exception as e:
+        logging.warning(f"libmagic failed on {path}: {e}")
+        return False
+
+
 def _is_text_file(path: Path, read_bytes: int = 1024) -> bool:
     """
     Rough detection of text vs. binary by reading a small portion of the file.
-    Uses mimetypes first; otherwise checks for zero bytes or non-ASCII content.
+    Well-known suffixes are decided without any I/O. Otherwise uses mimetypes,
+    then checks for zero bytes or non-text content. Only a sample that passes
+    that check but is not valid UTF-8 is handed to libmagic (if python-magic
+    is installed), which may still reject it as binary.
     """
-    mime, _ = mimetypes.guess_type(path)
-    if mime is not None and (mime.startswith("text/") or mime == "application/xml"):
+    suffix = path.suffix.lower()
+    if suffix in _TEXT_EXTS:
+        return True
+    if suffix in _BIN_EXTS:
+        return False
+
+    if suffix in _get_mime_text_exts():
         return True
 
     try:
-        with open(path, "rb") as f:
-            chunk = f.read(read_bytes)
-        if b"\0" in chunk:
-            return False
-        non_ascii = sum(b > 127 for b in chunk)
-        ratio = non_ascii / len(chunk) if chunk else 0
-        return ratio < 0.30
+        # Unbuffered, so each read() is one read() syscall of exactly that size.
+        with open(path, "rb", buffering=0) as f:
+            chunk = f.read(_PROBE_BYTES)
+            # Most binary formats have a NUL byte in their header; stop there.
+            if b"\0" in chunk:
+                return False
+            if len(chunk) == _PROBE_BYTES:
+                chunk += f.read(read_bytes - _PROBE_BYTES)
     except OSError:
         return False
+    # Empty files (.gitkeep, py.typed, ...) are text; libmagic calls them binary.
+    if not chunk:
+        return True
+    # One C-level pass strips text bytes; only suspicious bytes remain.
+    residue = chunk.translate(None, _TEXT_BYTES)
+    if b"\0" in residue:
+        return False
+    if len(residue) / len(chunk) >= 0.30:
+        return False
+    # Doubtful only if the remaining bytes are not UTF-8 text.
+    if residue and _get_magic() is not None and not _is_utf8(chunk):
+        return not _is_binary_by_magic(path)
+    return True
+
+
+def _is_utf8(chunk: bytes) -> bool:
+    """
+    Check whether a sample decodes as UTF-8, allowing a character cut off at its end.
+    """
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(chunk, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
 
 
 def _read_file_content(path: Path) -> str:
     """
     Read the entire content of a text file.
+    Reads the raw bytes in one call and decodes them in a single pass,
+    translating newlines the same way text mode would.
     """
     try:
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            return f.read()
+        content = path.read_bytes().decode("utf-8", errors="replace")
     except OSError:
         return "(Could not read file)"
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
 
 
 def main():
@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import os
+from array import array
+
 from textual.app import App, ComposeResult
 from textual.containers import Vertical
 from textual.widgets import Static, Tree
@@ -12,13 +15,24 @@ from rich.text import Text
 from rich.style import Style
 from pathlib import Path
 
-from feed_llm.ignore_manager import should_ignore
+from feed_llm.ignore_manager import IgnoreMatcher, should_ignore
 
 # Define three selection states:
 # 0 = not selected, 1 = partially selected, 2 = fully selected
+# Packed two bits per child as 00 / 01 / 10, so "all children fully selected"
+# is the pattern 1010...10 and "none selected" is zero.
+
+
+def _all_selected_bits(count: int) -> int:
+    """Packed child bits of 'count' children that are all fully selected (10 each)."""
+    return ((1 << (2 * count)) - 1) // 3 * 2
+
 
+# Checkbox prefix shown in front of each label, indexed by selection state.
+_PREFIXES = ("[ ] ", "[-] ", "[x] ")
 
-class FileSelectionTree(Tree[str]):
+
+class FileSelectionTree(Tree[int]):
     """
     Tree widget for file selection with tri-state logic.
     Mouse behavior:
@@ -28,6 +42,7 @@ class FileSelectionTree(Tree[str]):
       - UP/DOWN: Move highlight.
       - ENTER: Toggle selection.
       - SPACE: Expand/Collapse.
+    Each node's data is an integer id that indexes the per-node arrays.
     """
 
     BINDINGS = [
@@ -44,163 +59,356 @@ class FileSelectionTree(Tree[str]):
         self,
         root_dir: Path,
         saved_state: list[str] | None = None,
-        ignore_patterns: list[str] | None = None,
+        ignore_matcher: IgnoreMatcher | None = None,
     ) -> None:
         """
         Initialize the tree.
 
         :param root_dir: Starting directory.
         :param saved_state: Optional list of relative file paths to pre-select.
-        :param ignore_patterns: Glob-like patterns for ignoring certain files/dirs.
+        :param ignore_matcher: Compiled ignore patterns for certain files/dirs.
         """
-        super().__init__("File Selection")
+        super().__init__("File Selection", 0)
         self.root_dir = root_dir
         self.saved_state = saved_state or []
-        self.ignore_patterns = ignore_patterns or []
-        self.node_to_path: dict[TextualTreeNode, Path] = {}
-        self.node_to_depth: dict[TextualTreeNode, int] = {}
-        self.path_to_node: dict[Path, TextualTreeNode] = {}
-        self.path_to_state: dict[Path, int] = {}
+        self.ignore_matcher = ignore_matcher
+        self._ignored_names: dict[str, bool] = {}
+        # Per-node data, indexed by node id (node.data); id 0 is the root directory.
+        # Paths are kept as the strings DirEntry.path already holds; Path objects
+        # are only created for the files handed back to the caller.
+        root_path = os.fspath(root_dir)
+        self._paths: list[str] = [root_path]
+        self._node_by_id: list[TextualTreeNode] = [self.root]
+        self._depths = array("i", [0])
+        self._parents = array("i", [-1])  # -1 for the root
+        self._states = bytearray(1)
+        self._is_dir = bytearray(b"\x01")  # From DirEntry at scan time; no stat()
+        self._labels: list[str] = ["📂 File Selection"]  # Icon and name, built once
+        # Children get contiguous ids, so each child list is a range (None until loaded).
+        self._children: list[range | None] = [None]
+        # Children's states packed 2 bits each (SWAR in a Python int), and the
+        # value those bits have when every child is fully selected.
+        self._child_bits: list[int] = [0]
+        self._full_bits: list[int] = [0]
+        self._path_to_idx: dict[str, int] = {root_path: 0}
         self.auto_expand = False
 
     def on_mount(self) -> None:
         """
-        Build the tree structure upon mounting.
+        Build the top level of the tree upon mounting.
+        Deeper levels are loaded when a directory is expanded (see load_children).
         """
         self.root.expand()
-        self._build_tree(self.root, self.root_dir)
+        self.load_children(self.root)
         self.cursor_line = 0
 
         # --- Restore saved state (if provided) ---
-        for rel_path in self.saved_state:
-            abs_path = self.root_dir / rel_path
-            if abs_path in self.path_to_node:
-                self.set_path_state(abs_path, 2)
-                self.path_to_node[abs_path].refresh()
-
-    def _build_tree(
-        self, parent_node: TextualTreeNode, directory: Path, depth: int = 0
-    ) -> None:
+        self._restore_selection(self.saved_state)
+
+    def _restore_selection(self, rel_paths: list[str]) -> None:
         """
-        Recursively build the tree from a directory.
-        Directories are labeled "[D] name", files "[F] name".
-        Ignored paths are simply not added to the tree.
+        Fully select the saved paths, then recompute their ancestors in one
+        bottom-up pass, instead of walking up to the root once per path.
         """
-        self.path_to_state[directory] = 0
-        self.node_to_path[parent_node] = directory
-        self.path_to_node[directory] = parent_node
-        self.node_to_depth[parent_node] = depth
+        root = self._paths[0]
+        ancestors: set[int] = set()
+        for rel_path in rel_paths:
+            idx = self._load_path(os.path.join(root, rel_path))
+            if idx is None:
+                continue
+            self._write_state(idx, 2)
+            if self._is_dir[idx]:
+                self._propagate_state_to_children(idx, 2)
+            self._node_by_id[idx].refresh()
+            parent_idx = self._parents[idx]
+            while parent_idx >= 0 and parent_idx not in ancestors:
+                ancestors.add(parent_idx)
+                parent_idx = self._parents[parent_idx]
+
+        # Deepest first, so each directory's child bits are final when it is visited.
+        for idx in sorted(ancestors, key=self._depths.__getitem__, reverse=True):
+            new_state = self._state_from_children(idx)
+            if self._states[idx] != new_state:
+                self._write_state(idx, new_state)
+                self._node_by_id[idx].refresh()
+
+    def on_tree_node_expanded(self, event: Tree.NodeExpanded[int]) -> None:
+        """
+        Populate a directory's children the first time it is expanded.
+        Expansion through this widget loads synchronously before expanding
+        (toggle_expand_collapse, action_toggle_expand_all); this is a fallback
+        for other callers of TreeNode.expand().
+        """
+        self.load_children(event.node)
+
+    def _scan_directory(
+        self, directory: str
+    ) -> tuple[list[os.DirEntry[str]], list[os.DirEntry[str]]]:
+        """
+        List one directory level with os.scandir, sorted by name and without ignored entries.
+        Ignored directories are never descended into, by the tree or by walk_files.
+        DirEntry objects answer is_dir()/is_file() from the directory listing itself,
+        without an extra stat() per entry.
 
+        :return: (subdirectory entries, file entries)
+        """
+        is_ignored = self._is_ignored
+        entries: list[os.DirEntry[str]] = []
         try:
-            entries: list[Path] = sorted(directory.iterdir())
-        except (PermissionError, FileNotFoundError):
+            with os.scandir(directory) as it:
+                # Filter out ignored items while listing, before sorting or stat-ing them.
+                entries.extend(e for e in it if not is_ignored(e))
+        except OSError as e:
+            # Unreadable or vanished directory: keep whatever was listed and go on.
+            self.log.warning(f"Cannot list {directory}: {e}")
+        entries.sort(key=lambda e: e.name)
+
+        dirs: list[os.DirEntry[str]] = []
+        files: list[os.DirEntry[str]] = []
+        for entry in entries:
+            # is_dir()/is_file() may need a stat() (e.g. for symlinks), which can fail.
+            try:
+                if entry.is_dir():
+                    dirs.append(entry)
+                elif entry.is_file():
+                    files.append(entry)
+            except OSError as e:
+                self.log.warning(f"Skipping {entry.path}: {e}")
+        return dirs, files
+
+    def _is_ignored(self, entry: os.DirEntry[str]) -> bool:
+        """
+        should_ignore, memoized by entry name. Names such as __init__.py or src
+        repeat across directories, and a dict hit is much cheaper than the regex.
+        """
+        ignored = self._ignored_names.get(entry.name)
+        if ignored is None:
+            ignored = should_ignore(entry, self.ignore_matcher)
+            self._ignored_names[entry.name] = ignored
+        return ignored
+
+    def load_children(self, node: TextualTreeNode) -> None:
+        """
+        Add the direct children of a directory node, unless already loaded.
+        New children inherit the directory's selection state, so selecting a
+        directory before expanding it still selects everything inside it.
+        Ignored paths are simply not added to the tree.
+        """
+        idx = node.data
+        if self._children[idx] is not None:
             return
 
-        # Filter out ignored items
-        entries = [e for e in entries if not should_ignore(e, self.ignore_patterns)]
-
-        dirs = [e for e in entries if e.is_dir()]
-        files = [e for e in entries if e.is_file()]
-
-        for entry in dirs:
-            node_label = entry.name
-            new_node = parent_node.add(node_label, expand=False, allow_expand=True)
-            self.path_to_state[entry] = 0
-            self.node_to_path[new_node] = entry
-            self.path_to_node[entry] = new_node
-            self.node_to_depth[new_node] = depth + 1
-            # Recursively build children
-            self._build_tree(new_node, entry, depth + 1)
-
-        for entry in files:
-            node_label = entry.name
-            leaf_node = parent_node.add_leaf(node_label)
-            self.path_to_state[entry] = 0
-            self.node_to_path[leaf_node] = entry
-            self.path_to_node[entry] = leaf_node
-            self.node_to_depth[leaf_node] = depth + 1
-
-    def get_path_state(self, path: Path) -> int:
-        return self.path_to_state.get(path, 0)
-
-    def set_path_state(
+        # A directory without loaded children can only be unselected or fully selected.
+        state = self._states[idx]
+        depth = self._depths[idx] + 1
+        dirs, files = self._scan_directory(self._paths[idx])
+
+        # Ids are assigned contiguously, so every per-node array grows by one block.
+        first = len(self._paths)
+        nodes = self._add_nodes(node, first, dirs, files)
+        paths = [e.path for e in dirs]
+        paths += [e.path for e in files]
+        count = len(paths)
+        ids = range(first, first + count)
+
+        self._children[idx] = ids
+        self._full_bits[idx] = _all_selected_bits(count)
+        self._child_bits[idx] = self._full_bits[idx] if state == 2 else 0
+        self._paths += paths
+        self._node_by_id += nodes
+        self._depths += array("i", [depth]) * count
+        self._parents += array("i", [idx]) * count
+        self._states += bytes([state]) * count
+        self._is_dir += b"\x01" * len(dirs) + b"\x00" * len(files)
+        self._labels += [f"📂 {e.name}" for e in dirs]
+        self._labels += [f"📄 {e.name}" for e in files]
+        self._children += [None] * count
+        self._child_bits += [0] * count
+        self._full_bits += [0] * count
+        self._path_to_idx.update(zip(paths, ids))
+
+    def _add_nodes(
         self,
-        path: Path,
+        parent: TextualTreeNode,
+        first: int,
+        dirs: list[os.DirEntry[str]],
+        files: list[os.DirEntry[str]],
+    ) -> list[TextualTreeNode]:
+        """
+        Append one directory's children to 'parent', with ids starting at 'first'.
+
+        TreeNode.add()/add_leaf() invalidate the whole tree (and parse each label
+        as markup) for every single node; batch_update() does not avoid that.
+        This does what add() does for a list of nodes, then invalidates once.
+        """
+        nodes = [
+            self._add_node(parent, Text(e.name), i)
+            for i, e in enumerate(dirs + files, first)
+        ]
+        for child in nodes[len(dirs) :]:
+            child._allow_expand = False
+        parent._children.extend(nodes)
+        parent._updates += 1
+        self._invalidate()
+        return nodes
+
+    def _load_path(self, path: str) -> int | None:
+        """
+        Return the node id for 'path', loading the children of its ancestors on demand.
+        Returns None if the path is not part of the tree (e.g. ignored or deleted).
+        """
+        idx = self._path_to_idx.get(path)
+        if idx is not None:
+            return idx
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        parent_idx = self._load_path(parent)
+        if parent_idx is None or not self._is_dir[parent_idx]:
+            return None
+        self.load_children(self._node_by_id[parent_idx])
+        return self._path_to_idx.get(path)
+
+    def walk_files(self, directory: str) -> list[Path]:
+        """
+        List all files below a directory whose children have not been loaded yet,
+        in the same order as the tree would show them (directories before files).
+        Uses an explicit stack instead of recursion.
+        """
+        results: list[Path] = []
+        stack: list[tuple[str, bool]] = [(directory, True)]
+        while stack:
+            path, is_dir = stack.pop()
+            if not is_dir:
+                results.append(Path(path))
+                continue
+            dirs, files = self._scan_directory(path)
+            stack.extend((e.path, False) for e in reversed(files))
+            stack.extend((e.path, True) for e in reversed(dirs))
+        return results
+
+    def collect_selected_files(self) -> list[Path]:
+        """
+        Walk the tree in display order (pre-order) and return fully selected files.
+        Unselected subtrees are skipped, since all of their descendants are unselected.
+        """
+        results: list[Path] = []
+        stack = [0]
+        while stack:
+            idx = stack.pop()
+            state = self._states[idx]
+            if state == 0:
+                continue
+            children = self._children[idx]
+            # If fully selected (2) and it's actually a file (not a dir)
+            if not self._is_dir[idx]:
+                if state == 2:
+                    results.append(Path(self._paths[idx]))
+            elif children is None:
+                # Selected before ever being expanded: read it from disk.
+                results.extend(self.walk_files(self._paths[idx]))
+            else:
+                stack.extend(reversed(children))
+        return results
+
+    def _set_state(
+        self,
+        idx: int,
         state: int,
         propagate_to_children: bool = True,
         update_parent: bool = True,
     ) -> None:
-        self.path_to_state[path] = state
-        if path.is_dir() and propagate_to_children:
-            self._propagate_state_to_children(path, state)
+        self._write_state(idx, state)
+        if propagate_to_children and self._is_dir[idx]:
+            self._propagate_state_to_children(idx, state)
         if update_parent:
-            self._update_parents(path)
-        # Refresh the node (if it exists) to update the label
-        node = self.path_to_node.get(path)
-        if node is not None:
-            node.refresh()
+            self._update_parents(idx)
+        # Refresh the node to update the label
+        self._node_by_id[idx].refresh()
 
-    def _propagate_state_to_children(self, path: Path, state: int) -> None:
-        try:
-            for child_path in path.iterdir():
-                if child_path in self.path_to_state and state in (0, 2):
-                    self.set_path_state(child_path, state, True, False)
-        except Exception:
-            pass  # In case of permission errors etc.
-
-    def _update_parents(self, path: Path) -> None:
-        parent_dir = path.parent
-        if parent_dir == path:
+    def _write_state(self, idx: int, state: int) -> None:
+        """
+        Store a node's state and mirror it into its parent's packed child bits.
+        """
+        old = self._states[idx]
+        if old == state:
             return
-        if parent_dir in self.path_to_state:
-            child_states = self._collect_child_states(parent_dir)
-            if child_states and all(s == 2 for s in child_states):
-                self.set_path_state(parent_dir, 2, False, False)
-            elif child_states and all(s == 0 for s in child_states):
-                self.set_path_state(parent_dir, 0, False, False)
-            else:
-                self.set_path_state(parent_dir, 1, False, False)
-            node = self.path_to_node.get(parent_dir)
-            if node is not None:
-                node.refresh()
-            self._update_parents(parent_dir)
-
-    def _collect_child_states(self, parent_path: Path) -> list[int]:
-        states = []
-        try:
-            for entry in parent_path.iterdir():
-                if entry in self.path_to_state:
-                    states.append(self.path_to_state[entry])
-        except Exception:
-            pass
-        return states
+        self._states[idx] = state
+        parent_idx = self._parents[idx]
+        if parent_idx >= 0:
+            shift = 2 * (idx - self._children[parent_idx].start)
+            self._child_bits[parent_idx] ^= (old ^ state) << shift
+
+    def _propagate_state_to_children(self, idx: int, state: int) -> None:
+        """
+        Write 'state' to every loaded descendant of a directory with an explicit stack.
+        Each directory's children are filled as one slice, and their packed bits
+        are set in one assignment. Unloaded descendants pick the state up from
+        their directory when loaded.
+        """
+        if state not in (0, 2):
+            return
+        states = self._states
+        children = self._children
+        nodes = self._node_by_id
+        stack = [idx]
+        while stack:
+            dir_idx = stack.pop()
+            kids = children[dir_idx]
+            if kids is None:
+                continue
+            states[kids.start : kids.stop] = bytes([state]) * len(kids)
+            self._child_bits[dir_idx] = self._full_bits[dir_idx] if state == 2 else 0
+            for child_idx in kids:
+                nodes[child_idx].refresh()
+            stack.extend(kids)
+
+    def _update_parents(self, idx: int) -> None:
+        """
+        Recompute the state of each ancestor from its packed child bits, bottom-up.
+        Stops at the first ancestor whose state does not change, since nothing
+        above it can change either.
+        """
+        states = self._states
+        parents = self._parents
+        parent_idx = parents[idx]
+        while parent_idx >= 0:
+            new_state = self._state_from_children(parent_idx)
+            if states[parent_idx] == new_state:
+                break
+            self._write_state(parent_idx, new_state)
+            self._node_by_id[parent_idx].refresh()
+            parent_idx = parents[parent_idx]
+
+    def _state_from_children(self, idx: int) -> int:
+        """
+        Aggregate state of a loaded directory, from its packed child bits.
+        """
+        bits = self._child_bits[idx]
+        if bits == self._full_bits[idx]:
+            return 2
+        return 0 if bits == 0 else 1
 
     def toggle_selection(self, node: TextualTreeNode) -> None:
-        path = self.node_to_path[node]
-        current_state = self.get_path_state(path)
-        if current_state in (0, 1):
-            self.set_path_state(path, 2)
+        idx = node.data
+        if self._states[idx] in (0, 1):
+            self._set_state(idx, 2)
         else:
-            self.set_path_state(path, 0)
-        node.refresh()
+            self._set_state(idx, 0)
 
     def toggle_expand_collapse(self, node: TextualTreeNode) -> None:
         if node.allow_expand:
+            # Load before expanding, so the first frame already shows the children.
+            self.load_children(node)
             node.toggle()
             self.refresh(layout=True)
 
     def render_label(
         self, node: TextualTreeNode, base_style: Style, style: Style
     ) -> Text:
-        path = self.node_to_path[node]
-        state = self.path_to_state[path]
-        icon = "📂" if path.is_dir() else "📄"
-        prefix = "[ ] " if state == 0 else "[x] " if state == 2 else "[-] "
-        return Text.assemble(
-            prefix,
-            f"{icon} {node.label}",
-            style=style,
-        )
+        # Called for every visible line on each repaint: only the prefix varies.
+        idx = node.data
+        return Text(_PREFIXES[self._states[idx]] + self._labels[idx], style=style)
 
     async def _on_click(self, event: events.Click) -> None:
         async with self.lock:
@@ -215,7 +423,7 @@ class FileSelectionTree(Tree[str]):
             if node is None:
                 return
             x = event.x
-            x_offset = self.node_to_depth[node] * self.prefix_click_width
+            x_offset = self._depths[node.data] * self.prefix_click_width
             if x_offset <= x < x_offset + self.click_field_width:
                 self.toggle_selection(node)
             else:
@@ -234,13 +442,26 @@ class FileSelectionTree(Tree[str]):
         node = self.cursor_node
         if node is not None:
             self.toggle_selection(node)
-            self.refresh(layout=True)
 
     def action_toggle_expand_collapse(self) -> None:
         node = self.cursor_node
         if node is not None:
             self.toggle_expand_collapse(node)
-            self.refresh(layout=True)
+
+    def action_toggle_expand_all(self) -> None:
+        """
+        Tree's expand/collapse-all-siblings binding, with the siblings' children
+        loaded before they are expanded. Tree only expands when every sibling is
+        collapsed; otherwise it collapses them, which needs nothing loaded.
+        """
+        node = self.cursor_node
+        if node is not None and node.parent is not None:
+            siblings = node.siblings
+            if all(sibling.is_collapsed for sibling in siblings):
+                for sibling in siblings:
+                    if sibling.allow_expand:
+                        self.load_children(sibling)
+        super().action_toggle_expand_all()
 
 
 class FileSelectionApp(App[None]):
@@ -264,12 +485,12 @@ class FileSelectionApp(App[None]):
         self,
         root_dir: Path,
         saved_state: list[str] | None = None,
-        ignore_patterns: list[str] | None = None,
+        ignore_matcher: IgnoreMatcher | None = None,
     ) -> None:
         super().__init__()
         self.root_dir: Path = root_dir
         self.file_tree: FileSelectionTree = FileSelectionTree(
-            root_dir, saved_state=saved_state, ignore_patterns=ignore_patterns
+            root_dir, saved_state=saved_state, ignore_matcher=ignore_matcher
         )
         self.selected_paths: list[Path] = []
         self.save_state: bool = (
@@ -301,18 +522,13 @@ class FileSelectionApp(App[None]):
         self.exit()
 
     def _collect_selected_files(self) -> list[Path]:
-        results: list[Path] = []
-        for path, state in self.file_tree.path_to_state.items():
-            # If fully selected (2) and it's actually a file (not a dir)
-            if state == 2 and not path.is_dir():
-                results.append(path)
-        return results
+        return self.file_tree.collect_selected_files()
 
 
 def run_file_selection_app(
     directory: Path,
     saved_state: list[str] | None = None,
-    ignore_patterns: list[str] | None = None,
+    ignore_matcher: IgnoreMatcher | None = None,
 ) -> tuple[list[Path], bool]:
     """
     Instantiate and run FileSelectionApp.
@@ -320,11 +536,11 @@ def run_file_selection_app(
 
     :param directory: Root directory to browse.
     :param saved_state: Previously selected file paths (relative).
-    :param ignore_patterns: Patterns to ignore.
+    :param ignore_matcher: Compiled patterns to ignore.
     :return: (selected file paths, whether to save new state)
     """
     app = FileSelectionApp(
-        directory, saved_state=saved_state, ignore_patterns=ignore_patterns
+        directory, saved_state=saved_state, ignore_matcher=ignore_matcher
     )
     app.run()
     return app.selected_paths, app.save_state